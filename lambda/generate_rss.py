@@ -1,123 +1,310 @@
 import os
 import json
+import base64
+import gzip
+import hashlib
+import io
+import time
+import logging
 import boto3
-from datetime import datetime
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from xml.sax.saxutils import escape
 
-dynamodb = boto3.resource('dynamodb')
+TORRENT_NS = 'http://xmlns.ezrss.it/0.1/'
+RSS_PROLOG = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    f'<rss xmlns:torrent="{TORRENT_NS}" version="2.0">\n'
+)
+
+# Serialized feed kept across warm invocations for as long as clients may cache it
+_TTL = 1800
+_CACHE = {'body': None, 'etag': None, 'gzip_body': None, 'gzip_etag': None, 'exp': 0.0}
+
+# Must match the RestApi's binary media types so API Gateway decodes the gzip body
+RSS_MEDIA_TYPE = 'application/rss+xml'
+
+# Configuration and clients are resolved once per container
+TABLE_NAME = os.environ['TABLE_NAME']
+FEED_TITLE = os.environ.get('FEED_TITLE', 'YTS 1080p Movies Feed')
+FEED_DESCRIPTION = os.environ.get('FEED_DESCRIPTION', 'Latest 1080p movies from YTS for qBittorrent')
+
+API_ID = os.environ.get('API_GATEWAY_REST_API_ID')
+REGION = os.environ.get('API_GATEWAY_REGION')
+STAGE = os.environ.get('API_GATEWAY_STAGE', 'prod')
+
+# Feed URL is fixed when the API is known, otherwise derived from each request
+FEED_LINK = f"https://{API_ID}.execute-api.{REGION}.amazonaws.com/{STAGE}/rss" if API_ID and REGION else None
+
+# Low-level client: items are read straight from the wire format, without
+# the resource layer's Decimal conversion of every number
+CLIENT = boto3.client('dynamodb')
+INTEGER_ATTRIBUTES = frozenset({'timestamp', 'seeds', 'peers'})
+
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Categories, hashes and titles repeat across rebuilds of the feed
+@lru_cache(maxsize=1024)
+def _escape(text):
+    return escape(text)
+
+@lru_cache(maxsize=128)
+def rfc822(timestamp):
+    """Format a Unix timestamp as an RFC 822 date in GMT."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+def plain_item(raw):
+    """Flatten a low-level DynamoDB item into a dict of plain values.
+
+    Only string and number attributes are kept. Known integer attributes
+    become ints; any other number keeps its exact value as a Decimal.
+    """
+    item = {}
+    for name, value in raw.items():
+        if 'S' in value:
+            item[name] = value['S']
+        elif 'N' in value:
+            item[name] = int(value['N']) if name in INTEGER_ATTRIBUTES else Decimal(value['N'])
+    return item
+
+def xml_text(value):
+    """Escape a value for use as XML element text; None becomes empty."""
+    if value is None:
+        return ''
+    return _escape(str(value))
+
+# Channel metadata around the feed URL never changes, so only the link itself
+# has to be formatted per request
+CHANNEL_HEAD = (
+    '  <channel>\n'
+    f'    <title>{xml_text(FEED_TITLE)}</title>\n'
+    f'    <description>{xml_text(FEED_DESCRIPTION)}</description>\n'
+    '    <link>'
+)
+CHANNEL_TAIL = (
+    '</link>\n'
+    '    <language>en-US</language>\n'
+    '    <ttl>30</ttl>\n'  # Cache for 30 minutes
+)
+
+def channel_header(feed_link):
+    """Build the opening of the channel element for the given feed URL."""
+    return CHANNEL_HEAD + xml_text(feed_link) + CHANNEL_TAIL
+
+# Fully computed up front when the feed URL doesn't depend on the request
+CHANNEL_HEADER = channel_header(FEED_LINK) if FEED_LINK else None
+
+def get_header(event, name):
+    """Return a request header value, matching the name case-insensitively."""
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def weak_etag(tag):
+    """Drop the weak-validator prefix so tags compare by their opaque value."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+def etag_matches(event, etag):
+    """Check whether the request's If-None-Match header matches the given ETag.
+
+    If-None-Match uses weak comparison (RFC 9110 section 13.1.2), so a
+    W/-prefixed tag matches the same tag without the prefix.
+    """
+    if_none_match = get_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [weak_etag(tag) for tag in if_none_match.split(',')]
+    return '*' in candidates or weak_etag(etag) in candidates
+
+def accepts_gzip(event):
+    """Check whether a gzip body will reach the client as binary.
+
+    API Gateway only converts a base64 body back to binary when the first
+    media type in the request's Accept header is a binary media type.
+    """
+    accept = (get_header(event, 'Accept') or '').split(',')[0].split(';')[0].strip()
+    return accept == RSS_MEDIA_TYPE and coding_accepted(get_header(event, 'Accept-Encoding'), 'gzip')
+
+def coding_accepted(accept_encoding, coding):
+    """Check whether an Accept-Encoding header allows a content coding.
+
+    An explicit entry for the coding wins over '*'; a q-value of 0 (or an
+    unparseable one) means not acceptable.
+    """
+    qvalues = {}
+    for part in (accept_encoding or '').split(','):
+        name, *params = part.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        qvalues[name] = q
+    return qvalues.get(coding, qvalues.get('*', 0.0)) > 0
+
+def not_modified(etag):
+    """Build a 304 response for a client that already has the current feed."""
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Cache-Control': f'max-age={_TTL}',
+            'Vary': 'Accept, Accept-Encoding'
+        }
+    }
+
+def feed_response(event):
+    """Serve the cached feed, gzip-compressed when the client supports it."""
+    use_gzip = accepts_gzip(event)
+    etag = _CACHE['gzip_etag'] if use_gzip else _CACHE['etag']
+    if etag_matches(event, etag):
+        return not_modified(etag)
+    
+    headers = {
+        'Content-Type': f'{RSS_MEDIA_TYPE}; charset=utf-8',
+        'Cache-Control': f'max-age={_TTL}',  # Cache for 30 minutes
+        'ETag': etag,
+        'Vary': 'Accept, Accept-Encoding',
+        'Access-Control-Allow-Origin': '*'  # Allow qBittorrent to access
+    }
+    if not use_gzip:
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': _CACHE['body']
+        }
+    
+    headers['Content-Encoding'] = 'gzip'
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': _CACHE['gzip_body'],
+        'isBase64Encoded': True
+    }
 
 def handler(event, context):
     """Generate RSS feed compatible with qBittorrent"""
     
-    # Get configuration from environment variables
-    table_name = os.environ['TABLE_NAME']
-    feed_title = os.environ.get('FEED_TITLE', 'YTS 1080p Movies Feed')
-    feed_description = os.environ.get('FEED_DESCRIPTION', 'Latest 1080p movies from YTS for qBittorrent')
-    
-    # Construct the feed URL
-    api_id = os.environ.get('API_GATEWAY_REST_API_ID')
-    region = os.environ.get('API_GATEWAY_REGION')
-    stage = os.environ.get('API_GATEWAY_STAGE', 'prod')
+    # Serve the cached feed while it is still fresh
+    now = time.monotonic()
+    if _CACHE['body'] and now < _CACHE['exp']:
+        return feed_response(event)
     
-    if api_id and region:
-        feed_link = f"https://{api_id}.execute-api.{region}.amazonaws.com/{stage}/rss"
+    # Construct the channel header, including the feed URL
+    if CHANNEL_HEADER:
+        header = CHANNEL_HEADER
     else:
-        host = event.get('headers', {}).get('Host', 'example.com')
-        feed_link = f"https://{host}{event.get('path', '/rss')}"
+        host = get_header(event, 'Host') or 'example.com'
+        header = channel_header(f"https://{host}{event.get('path', '/rss')}")
     
     try:
-        # Get items from DynamoDB
-        table = dynamodb.Table(table_name)
-        
-        # Scan for all items (you might want to add pagination for large datasets)
-        response = table.scan()
-        items = response.get('Items', [])
-        
-        # Sort by timestamp descending (newest first)
-        items.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-        
-        # Create RSS feed with torrent namespace
-        rss = Element('rss', version='2.0')
-        rss.set('xmlns:torrent', 'http://xmlns.ezrss.it/0.1/')
+        # Query the category index for the 50 most recent items (newest first).
+        # A single page is capped at 1 MB, so keep following LastEvaluatedKey
+        # until we have enough items or the index is exhausted.
+        items = []
+        query_kwargs = {
+            'TableName': TABLE_NAME,
+            'IndexName': 'ByCategory',
+            'KeyConditionExpression': 'category = :category',
+            'ExpressionAttributeValues': {':category': {'S': 'Movies/1080p'}},
+            'ScanIndexForward': False,
+            # Only fetch the attributes rendered into the feed
+            'ProjectionExpression': '#id, #ts, title, description, link, guid, category, #sz, seeds, peers',
+            'ExpressionAttributeNames': {'#id': 'id', '#ts': 'timestamp', '#sz': 'size'}
+        }
+        while len(items) < 50:
+            response = CLIENT.query(Limit=50 - len(items), **query_kwargs)
+            items.extend(plain_item(raw) for raw in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         
-        channel = SubElement(rss, 'channel')
+        # Write the feed straight into a single buffer; its shape is fixed,
+        # so there is no need to build and then serialize an element tree
+        buf = io.StringIO()
+        w = buf.write
+        w(RSS_PROLOG)
         
         # Add channel metadata
-        SubElement(channel, 'title').text = feed_title
-        SubElement(channel, 'description').text = feed_description
-        SubElement(channel, 'link').text = feed_link
-        SubElement(channel, 'language').text = 'en-US'
-        SubElement(channel, 'lastBuildDate').text = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
-        SubElement(channel, 'ttl').text = '30'  # Cache for 30 minutes
+        w(header)
+        # The channel only changes when its newest item does, which keeps the
+        # body (and therefore the ETag) stable between rebuilds
+        last_build = items[0]['timestamp'] if items else int(time.time())
+        w(f"    <lastBuildDate>{rfc822(last_build)}</lastBuildDate>\n")
         
-        # Add items to feed (limit to recent items)
-        for item in items[:50]:  # Limit to 50 most recent items
-            rss_item = SubElement(channel, 'item')
+        # Add items to feed
+        for item in items:
+            w('    <item>\n')
             
             # Title with quality and size info for qBittorrent filtering
-            SubElement(rss_item, 'title').text = item.get('title', 'Untitled')
+            w(f"      <title>{xml_text(item.get('title', 'Untitled'))}</title>\n")
             
             # Description with CDATA for HTML content
-            description = item.get('description', '')
-            SubElement(rss_item, 'description').text = description
+            w(f"      <description>{xml_text(item.get('description', ''))}</description>\n")
             
             # Direct torrent URL as link
-            SubElement(rss_item, 'link').text = item.get('link', '')
+            w(f"      <link>{xml_text(item.get('link', ''))}</link>\n")
             
             # Use torrent hash as GUID if available
             guid = item.get('guid', item.get('id', ''))
-            SubElement(rss_item, 'guid', isPermaLink='false').text = guid
+            w(f'      <guid isPermaLink="false">{xml_text(guid)}</guid>\n')
             
             # Category for filtering
-            SubElement(rss_item, 'category').text = item.get('category', 'Movies/1080p')
+            w(f"      <category>{xml_text(item.get('category', 'Movies/1080p'))}</category>\n")
             
             # Publication date
             timestamp = item.get('timestamp', 0)
             if timestamp:
-                pub_date = datetime.fromtimestamp(int(timestamp))
-                SubElement(rss_item, 'pubDate').text = pub_date.strftime('%a, %d %b %Y %H:%M:%S GMT')
+                w(f"      <pubDate>{rfc822(timestamp)}</pubDate>\n")
             
             # Add torrent-specific elements for qBittorrent
             if item.get('seeds'):
-                torrent_seeds = SubElement(rss_item, '{http://xmlns.ezrss.it/0.1/}seeds')
-                torrent_seeds.text = str(item.get('seeds', 0))
+                w(f"      <torrent:seeds>{item['seeds']}</torrent:seeds>\n")
             
             if item.get('peers'):
-                torrent_peers = SubElement(rss_item, '{http://xmlns.ezrss.it/0.1/}peers')
-                torrent_peers.text = str(item.get('peers', 0))
+                w(f"      <torrent:peers>{item['peers']}</torrent:peers>\n")
             
             if item.get('size'):
-                torrent_size = SubElement(rss_item, '{http://xmlns.ezrss.it/0.1/}contentLength')
-                torrent_size.text = item.get('size', '')
+                w(f"      <torrent:contentLength>{xml_text(item['size'])}</torrent:contentLength>\n")
             
             if item.get('guid'):
-                torrent_hash = SubElement(rss_item, '{http://xmlns.ezrss.it/0.1/}infoHash')
-                torrent_hash.text = item.get('guid', '')
+                w(f"      <torrent:infoHash>{xml_text(item['guid'])}</torrent:infoHash>\n")
+            
+            w('    </item>\n')
         
-        # Convert to pretty XML string
-        rough_string = tostring(rss, encoding='unicode')
-        reparsed = minidom.parseString(rough_string)
-        xml_string = reparsed.toprettyxml(indent="  ")
+        w('  </channel>\n</rss>')
+        xml_string = buf.getvalue()
         
-        # Clean up extra blank lines
-        xml_lines = [line for line in xml_string.split('\n') if line.strip()]
-        xml_string = '\n'.join(xml_lines)
+        # Compress once per rebuild; the gzip variant gets its own validator
+        xml_bytes = xml_string.encode('utf-8')
+        gzip_body = base64.b64encode(gzip.compress(xml_bytes, compresslevel=6)).decode('ascii')
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/rss+xml; charset=utf-8',
-                'Cache-Control': 'max-age=1800',  # Cache for 30 minutes
-                'Access-Control-Allow-Origin': '*'  # Allow qBittorrent to access
-            },
-            'body': xml_string
-        }
+        # Strong validator so pollers can revalidate with If-None-Match
+        digest = hashlib.blake2b(xml_bytes, digest_size=16).hexdigest()
+        
+        _CACHE.update(
+            body=xml_string,
+            etag=f'"{digest}"',
+            gzip_body=gzip_body,
+            gzip_etag=f'"{digest}-gzip"',
+            exp=now + _TTL
+        )
+        
+        return feed_response(event)
         
     except Exception as e:
-        print(f"Error generating RSS feed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("generate_rss failed")
         
         return {
             'statusCode': 500,
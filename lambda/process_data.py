@@ -1,183 +1,242 @@
 import os
 import json
 import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
 import urllib3
-import uuid
 from datetime import datetime
 from decimal import Decimal
 from urllib.parse import quote
 import re
+import logging
 
-# Initialize AWS and HTTP clients
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Initialize AWS and HTTP clients once per container
+TABLE_NAME = os.environ.get('TABLE_NAME')
 dynamodb = boto3.resource('dynamodb')
-http = urllib3.PoolManager()
+TABLE = dynamodb.Table(TABLE_NAME) if TABLE_NAME else None
+# Bound YTS calls so a hung host can't consume the whole Lambda timeout. The
+# default Retry(3) would retry timeouts, so a single attempt is allowed for
+# connect and read errors, capping a lookup at about 7 s.
+YTS_TIMEOUT = urllib3.Timeout(connect=2, read=5)
+YTS_RETRIES = urllib3.Retry(total=3, connect=0, read=0)
+http = urllib3.PoolManager(timeout=YTS_TIMEOUT, retries=YTS_RETRIES)
+
+IMDB_RE = re.compile(r'tt\d{7,10}')
+
+# Batch limits: at most one BatchWriteItem worth of movies per request, and no
+# new YTS lookup unless there is time for it (~7 s) plus the final flush
+MAX_BATCH_SIZE = 25
+LOOKUP_RESERVE_MS = 10000
 
 def extract_imdb_id(url_or_id):
     """Extract IMDB ID from a URL or return the ID if already in the correct format."""
-    print(f"-> extract_imdb_id: Received input '{url_or_id}'")
-    imdb_pattern = r'tt\d{7,10}'
+    logger.debug("extract_imdb_id: received input %r", url_or_id)
 
-    # Check if the input is already a valid IMDB ID
-    if re.match(f'^{imdb_pattern}$', url_or_id):
-        print(f"   Input is already a valid IMDB ID: {url_or_id}")
-        return url_or_id
-
-    # If not, search for the pattern within the input (assuming it's a URL)
-    match = re.search(imdb_pattern, url_or_id)
+    # A bare ID and a URL containing one are both handled by a single search
+    match = IMDB_RE.search(url_or_id)
     if match:
         extracted_id = match.group()
-        print(f"   Extracted IMDB ID from URL: {extracted_id}")
+        logger.debug("Extracted IMDB ID: %s", extracted_id)
         return extracted_id
 
-    print("   Could not find a valid IMDB ID in the input.")
+    logger.debug("Could not find a valid IMDB ID in the input")
     return None
 
 def search_yts_by_imdb(imdb_id):
     """Search the YTS API by IMDB ID."""
     url = f"https://yts.mx/api/v2/list_movies.json?query_term={imdb_id}&limit=1"
-    print(f"-> search_yts_by_imdb: Querying YTS API with URL: {url}")
+    logger.debug("search_yts_by_imdb: querying YTS API with URL %s", url)
 
     try:
         response = http.request('GET', url)
-        data = json.loads(response.data.decode('utf-8'))
-        print(f"   YTS API Response Status: {data.get('status')}")
-        # For deep debugging, you can uncomment the next line to see the full response
-        # print(f"   YTS API Full Response: {json.dumps(data, indent=2)}")
+        data = json.loads(response.data)
+        logger.debug("YTS API response status: %s", data.get('status'))
 
         if data.get('status') == 'ok' and data.get('data', {}).get('movie_count', 0) > 0:
             movies = data['data']['movies']
             # Ensure the found movie's IMDB ID matches the one we searched for
             for movie in movies:
                 if movie.get('imdb_code') == imdb_id:
-                    print(f"   Found matching movie: '{movie.get('title_long')}'")
+                    logger.info("Found matching movie: %r", movie.get('title_long'))
                     return [movie]
-            print("   Movie found, but IMDB ID did not match.")
+            logger.info("Movie found, but IMDB ID did not match")
             return []
-        print("   Movie not found in YTS database.")
+        logger.info("Movie not found in YTS database")
         return []
     except Exception as e:
-        print(f"   Error searching YTS: {str(e)}")
+        logger.error("Error searching YTS: %s", e)
         return []
 
+def json_response(status_code, payload):
+    """Build an API Gateway response with a JSON body."""
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(payload)
+    }
+
+def build_item(imdb_input):
+    """Look up a movie on YTS and build its DynamoDB feed item.
+
+    Returns an ``(item, None)`` pair on success, or ``(None, (status_code, payload))``
+    describing why no item could be built.
+    """
+    logger.info("IMDB input: %r", imdb_input)
+    
+    if not imdb_input:
+        logger.warning("No IMDB input provided")
+        return None, (400, {'error': 'Missing IMDB URL or ID.'})
+    
+    if not isinstance(imdb_input, str):
+        logger.warning("Non-string IMDB input %r", imdb_input)
+        return None, (400, {'error': 'Invalid IMDB format', 'provided': imdb_input})
+    
+    # Extract the IMDB ID
+    imdb_id = extract_imdb_id(imdb_input)
+    
+    if not imdb_id:
+        logger.warning("Invalid IMDB format for input %r", imdb_input)
+        return None, (400, {'error': 'Invalid IMDB format', 'provided': imdb_input})
+    
+    # Search YTS by the clean IMDB ID
+    movies = search_yts_by_imdb(imdb_id)
+    
+    if not movies:
+        return None, (404, {'message': 'Movie not found on YTS', 'imdb_id': imdb_id})
+    
+    # Process the found movie
+    movie = movies[0]
+    torrents = movie.get('torrents', [])
+    
+    # Select the best 1080p torrent (highest seeds) in a single pass
+    best_torrent = max(
+        (t for t in torrents if t.get('quality') == '1080p'),
+        key=lambda t: t.get('seeds', 0),
+        default=None
+    )
+    
+    if best_torrent is None:
+        return None, (404, {'message': 'No 1080p version available', 'movie': movie.get('title')})
+        
+    logger.debug("Selected best torrent with %s seeds", best_torrent.get('seeds'))
+    
+    # Prepare the item for DynamoDB
+    item_id = f"{imdb_id}-1080p"
+    rss_title = f"{movie.get('title')} ({movie.get('year')}) [1080p] [{best_torrent.get('size')}]"
+    
+    description = f"""<![CDATA[
+    <p><strong>{movie.get('title')} ({movie.get('year')})</strong></p>
+    <p>IMDB: {imdb_id} | Rating: {movie.get('rating')}/10 | Runtime: {movie.get('runtime')} min</p>
+    <p>Quality: 1080p | Size: {best_torrent.get('size')}</p>
+    <p>Seeds: {best_torrent.get('seeds')} | Peers: {best_torrent.get('peers')}</p>
+    <p>{movie.get('summary', 'No summary available.')}</p>
+    <img src="{movie.get('medium_cover_image', '')}" alt="Poster">
+    ]]>"""
+    
+    item = {
+        'id': item_id,
+        'timestamp': int(datetime.now().timestamp()),
+        'title': rss_title,
+        'description': description.strip(),
+        'link': best_torrent.get('url'),
+        'guid': best_torrent.get('hash'),
+        'category': 'Movies/1080p',
+        'size': best_torrent.get('size'),
+        'seeds': best_torrent.get('seeds', 0),
+        'peers': best_torrent.get('peers', 0),
+        'movie_id': movie.get('id'),
+        'imdb_code': imdb_id,
+        'year': movie.get('year'),
+        'rating': Decimal(str(movie.get('rating', 0))),
+        'added_date': datetime.now().isoformat()
+    }
+    
+    logger.debug("item=%s", item)
+    return item, None
+
 def handler(event, context):
-    """Main Lambda handler to find a movie on YTS and add it to a DynamoDB table."""
-    print(f"## STARTING EXECUTION ##")
-    print(f"Received event: {json.dumps(event, indent=2)}")
+    """Main Lambda handler to find movies on YTS and add them to a DynamoDB table.
+
+    Accepts a single movie (``{'imdb': ...}``) or a batch (``{'items': [{'imdb': ...}, ...]}``).
+    """
+    logger.debug("event=%s", event)
     
-    table_name = os.environ.get('TABLE_NAME')
-    if not table_name:
-        print("Error: TABLE_NAME environment variable is not set.")
+    if not TABLE_NAME:
+        logger.error("TABLE_NAME environment variable is not set")
         return {'statusCode': 500, 'body': json.dumps({'error': 'Server configuration error'})}
-    
-    table = dynamodb.Table(table_name)
-    print(f"Initialized DynamoDB table: {table_name}")
 
     try:
         # Parse the incoming request body
         body = json.loads(event['body']) if isinstance(event.get('body'), str) else event
-        print(f"Parsed request body: {json.dumps(body, indent=2)}")
-        
-        # Get IMDB input from common fields
-        imdb_input = body.get('imdb', body.get('url', body.get('query', '')))
-        print(f"IMDB input from body: '{imdb_input}'")
-        
-        if not imdb_input:
-            print("Error: No IMDB input provided.")
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Missing IMDB URL or ID.'})
-            }
-        
-        # Extract the IMDB ID
-        imdb_id = extract_imdb_id(imdb_input)
-        
-        if not imdb_id:
-            print(f"Error: Invalid IMDB format for input '{imdb_input}'.")
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Invalid IMDB format', 'provided': imdb_input})
-            }
-        
-        # Search YTS by the clean IMDB ID
-        movies = search_yts_by_imdb(imdb_id)
-        
-        if not movies:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'message': 'Movie not found on YTS', 'imdb_id': imdb_id})
-            }
+        logger.debug("body=%s", body)
         
-        # Process the found movie
-        movie = movies[0]
-        torrents = movie.get('torrents', [])
-        torrents_1080p = [t for t in torrents if t.get('quality') == '1080p']
-        print(f"Found {len(torrents_1080p)} torrent(s) with 1080p quality.")
+        if 'items' in body:
+            return handle_batch(body['items'], context)
         
-        if not torrents_1080p:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'message': 'No 1080p version available', 'movie': movie.get('title')})
-            }
-            
-        # Select the best torrent (highest seeds)
-        best_torrent = max(torrents_1080p, key=lambda t: t.get('seeds', 0))
-        print(f"Selected best torrent with {best_torrent.get('seeds')} seeds.")
-        
-        # Prepare the item for DynamoDB
-        item_id = f"{imdb_id}-1080p-{uuid.uuid4().hex[:8]}"
-        rss_title = f"{movie.get('title')} ({movie.get('year')}) [1080p] [{best_torrent.get('size')}]"
-        
-        description = f"""<![CDATA[
-        <p><strong>{movie.get('title')} ({movie.get('year')})</strong></p>
-        <p>IMDB: {imdb_id} | Rating: {movie.get('rating')}/10 | Runtime: {movie.get('runtime')} min</p>
-        <p>Quality: 1080p | Size: {best_torrent.get('size')}</p>
-        <p>Seeds: {best_torrent.get('seeds')} | Peers: {best_torrent.get('peers')}</p>
-        <p>{movie.get('summary', 'No summary available.')}</p>
-        <img src="{movie.get('medium_cover_image', '')}" alt="Poster">
-        ]]>"""
-        
-        item = {
-            'id': item_id,
-            'timestamp': int(datetime.now().timestamp()),
-            'title': rss_title,
-            'description': description.strip(),
-            'link': best_torrent.get('url'),
-            'guid': best_torrent.get('hash'),
-            'category': 'Movies/1080p',
-            'size': best_torrent.get('size'),
-            'seeds': best_torrent.get('seeds', 0),
-            'peers': best_torrent.get('peers', 0),
-            'movie_id': movie.get('id'),
-            'imdb_code': imdb_id,
-            'year': movie.get('year'),
-            'rating': Decimal(str(movie.get('rating', 0))),
-            'added_date': datetime.now().isoformat()
-        }
-        
-        print(f"Preparing to write the following item to DynamoDB:\n{json.dumps(item, indent=2, default=str)}")
-        
-        # Store in DynamoDB
-        table.put_item(Item=item)
-        print("Successfully added item to DynamoDB.")
+        # Get IMDB input from common fields
+        item, error = build_item(body.get('imdb', body.get('url', body.get('query', ''))))
+        if error:
+            return json_response(*error)
+        item_id = item['id']
+        
+        # Store in DynamoDB, keeping only the freshest entry per movie
+        try:
+            TABLE.put_item(
+                Item=item,
+                ConditionExpression=Attr('timestamp').not_exists() | Attr('timestamp').lt(item['timestamp'])
+            )
+            logger.info("Added item %s to DynamoDB", item_id)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            logger.info("Item %s already has a newer entry, skipping", item_id)
         
         # Return success response
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'message': 'Movie added successfully to RSS feed', 'item_id': item_id})
-        }
+        return json_response(200, {'message': 'Movie added successfully to RSS feed', 'item_id': item_id})
         
     except Exception as e:
-        print(f"An unexpected error occurred: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("process_data failed")
         
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Failed to process request', 'message': str(e)})
-        }
\ No newline at end of file
+        return json_response(500, {'error': 'Failed to process request', 'message': str(e)})
+
+def handle_batch(entries, context):
+    """Build items for a list of movies and write them with batched requests."""
+    if not isinstance(entries, list) or not entries:
+        return json_response(400, {'error': "'items' must be a non-empty list."})
+    if len(entries) > MAX_BATCH_SIZE:
+        return json_response(400, {'error': f"'items' may contain at most {MAX_BATCH_SIZE} entries."})
+    
+    built_items = []
+    failed = []
+    # batch_writer buffers puts until 25 items are collected (or the block
+    # exits) and sends them as one BatchWriteItem, retrying unprocessed ones;
+    # duplicate ids within the batch keep the last one. Nothing reaches
+    # DynamoDB before the flush, so stop starting lookups while there is
+    # still time left to flush what was built.
+    out_of_time = False
+    with TABLE.batch_writer(overwrite_by_pkeys=['id']) as batch:
+        for index, entry in enumerate(entries):
+            imdb_input = entry.get('imdb', entry.get('url', entry.get('query', ''))) if isinstance(entry, dict) else entry
+            if not out_of_time and context is not None and context.get_remaining_time_in_millis() < LOOKUP_RESERVE_MS:
+                logger.warning("Out of time, skipping %d remaining entries", len(entries) - index)
+                out_of_time = True
+            if out_of_time:
+                failed.append({'input': imdb_input, 'statusCode': 503, 'error': 'Not processed before the Lambda timeout'})
+                continue
+            item, error = build_item(imdb_input)
+            if error:
+                status_code, payload = error
+                failed.append({'input': imdb_input, 'statusCode': status_code, **payload})
+            else:
+                batch.put_item(Item=item)
+                built_items.append(item)
+    logger.info("Added %d item(s) to DynamoDB, %d failed", len(built_items), len(failed))
+    
+    return json_response(200, {
+        'message': f'Added {len(built_items)} movie(s) to RSS feed',
+        'item_ids': [item['id'] for item in built_items],
+        'failed': failed
+    })
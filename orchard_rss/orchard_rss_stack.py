@@ -16,19 +16,29 @@ class OrchardRssStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        # DynamoDB table to store RSS feed items
+        # DynamoDB table to store RSS feed items (one item per movie and quality)
         rss_table = dynamodb.Table(
             self, "RssFeedTable",
             partition_key=dynamodb.Attribute(
                 name="id",
                 type=dynamodb.AttributeType.STRING
             ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY  # For dev/test only
+        )
+
+        # Index for reading the newest items of a category without a full scan
+        rss_table.add_global_secondary_index(
+            index_name="ByCategory",
+            partition_key=dynamodb.Attribute(
+                name="category",
+                type=dynamodb.AttributeType.STRING
+            ),
             sort_key=dynamodb.Attribute(
                 name="timestamp",
                 type=dynamodb.AttributeType.NUMBER
             ),
-            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
-            removal_policy=RemovalPolicy.DESTROY  # For dev/test only
+            projection_type=dynamodb.ProjectionType.ALL
         )
 
         # Lambda function for processing and storing data
@@ -40,7 +50,9 @@ class OrchardRssStack(Stack):
             environment={
                 "TABLE_NAME": rss_table.table_name
             },
-            timeout=Duration.seconds(30)
+            timeout=Duration.seconds(30),
+            memory_size=1769,  # A full vCPU
+            architecture=lambda_.Architecture.ARM_64
         )
 
         # Lambda function for generating RSS feed
@@ -55,7 +67,9 @@ class OrchardRssStack(Stack):
                 "FEED_DESCRIPTION": "A dynamically generated RSS feed",
                 # "FEED_LINK": "https://example.com"  # Will be updated with actual API URL
             },
-            timeout=Duration.seconds(30)
+            timeout=Duration.seconds(30),
+            memory_size=1769,  # A full vCPU
+            architecture=lambda_.Architecture.ARM_64
         )
 
         # Grant permissions
@@ -66,7 +80,9 @@ class OrchardRssStack(Stack):
         api = apigateway.RestApi(
             self, "RssFeedApi",
             rest_api_name="RSS Feed Service",
-            description="API for posting data and retrieving RSS feed"
+            description="API for posting data and retrieving RSS feed",
+            # Lets the RSS Lambda return a gzip-compressed, base64-encoded body
+            binary_media_types=["application/rss+xml"]
         )
 
         # Create API key for authentication
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The Lambda handlers read their configuration and create AWS clients at
+# import time, so they need this environment before the tests import them.
+os.environ.setdefault("TABLE_NAME", "test-rss-table")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "lambda"))
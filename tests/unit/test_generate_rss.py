@@ -0,0 +1,276 @@
+import base64
+import gzip
+import time
+from decimal import Decimal
+from xml.dom import minidom
+
+import pytest
+
+import generate_rss
+
+BODY = "<?xml version='1.0' encoding='utf-8'?>\n<rss version=\"2.0\"></rss>"
+ETAG = '"0123456789abcdef"'
+GZIP_ETAG = '"0123456789abcdef-gzip"'
+GZIP_REQUEST = {'Accept': 'application/rss+xml, */*', 'Accept-Encoding': 'gzip, deflate'}
+
+
+@pytest.fixture
+def cached_feed(monkeypatch):
+    """Prime the warm-container cache with a fresh feed."""
+    for key, value in {
+        'body': BODY,
+        'etag': ETAG,
+        'gzip_body': base64.b64encode(gzip.compress(BODY.encode('utf-8'))).decode('ascii'),
+        'gzip_etag': GZIP_ETAG,
+        'exp': time.monotonic() + 60,
+    }.items():
+        monkeypatch.setitem(generate_rss._CACHE, key, value)
+
+
+class FakeClient:
+    """Stands in for the low-level DynamoDB client, returning one page per query."""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.pages.pop(0)
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    monkeypatch.setitem(generate_rss._CACHE, 'body', None)
+    monkeypatch.setitem(generate_rss._CACHE, 'exp', 0.0)
+
+
+def build_feed(monkeypatch, *pages):
+    """Rebuild the feed from the given query pages and return the client and body."""
+    client = FakeClient(*pages)
+    monkeypatch.setattr(generate_rss, 'CLIENT', client)
+    response = generate_rss.handler({'headers': {'Host': 'feeds.example.com'}, 'path': '/prod/rss'}, None)
+    assert response['statusCode'] == 200
+    return client, response['body']
+
+
+def test_rebuilt_feed_is_well_formed_and_escaped(monkeypatch, empty_cache):
+    _, body = build_feed(monkeypatch, {'Items': [
+        {
+            'id': {'S': 'tt1234567-1080p'},
+            'timestamp': {'N': '1700000000'},
+            'title': {'S': 'Fast & Furious <Extended> (2009) [1080p] [1.9 GB]'},
+            'description': {'S': '<![CDATA[<p>Cars & crime</p>]]>'},
+            'link': {'S': 'https://yts.mx/torrent/download/ABC?a=1&b=2'},
+            'guid': {'S': 'ABC'},
+            'category': {'S': 'Movies/1080p'},
+            'size': {'S': '1.9 GB'},
+            'seeds': {'N': '10'},
+            'peers': {'N': '2'},
+        },
+        {
+            'id': {'S': 'tt7654321-1080p'},
+            'timestamp': {'N': '1690000000'},
+            'title': {'S': 'Quiet Movie'},
+            'link': {'S': 'https://yts.mx/torrent/download/DEF'},
+            'guid': {'NULL': True},
+            'category': {'S': 'Movies/1080p'},
+            'seeds': {'N': '0'},
+        },
+    ]})
+
+    document = minidom.parseString(body.encode('utf-8'))
+    rss = document.documentElement
+    items = document.getElementsByTagName('item')
+
+    assert body.count('xmlns:torrent=') == 1
+    channel = document.getElementsByTagName('channel')[0]
+    assert channel.getElementsByTagName('link')[0].firstChild.data == 'https://feeds.example.com/prod/rss'
+    assert channel.getElementsByTagName('title')[0].firstChild.data == generate_rss.FEED_TITLE
+    assert channel.getElementsByTagName('ttl')[0].firstChild.data == '30'
+    assert rss.getAttribute('xmlns:torrent') == 'http://xmlns.ezrss.it/0.1/'
+    assert 'Fast &amp; Furious &lt;Extended&gt;' in body
+    assert '?a=1&amp;b=2' in body
+    assert '&lt;![CDATA[&lt;p&gt;Cars &amp; crime&lt;/p&gt;]]&gt;' in body
+
+    def text(item, tag):
+        return item.getElementsByTagName(tag)[0].firstChild.data
+
+    first, second = items
+    assert text(first, 'title') == 'Fast & Furious <Extended> (2009) [1080p] [1.9 GB]'
+    assert text(first, 'link') == 'https://yts.mx/torrent/download/ABC?a=1&b=2'
+    assert text(first, 'description') == '<![CDATA[<p>Cars & crime</p>]]>'
+    assert text(first, 'torrent:seeds') == '10'
+    assert text(first, 'torrent:peers') == '2'
+    assert text(first, 'torrent:contentLength') == '1.9 GB'
+    assert text(first, 'torrent:infoHash') == 'ABC'
+
+    # Zero seeds, missing peers/size and a NULL guid leave the optional elements out
+    for tag in ('torrent:seeds', 'torrent:peers', 'torrent:contentLength', 'torrent:infoHash'):
+        assert second.getElementsByTagName(tag) == []
+    assert text(second, 'guid') == 'tt7654321-1080p'
+
+
+def test_channel_header_formats_only_the_link():
+    header = generate_rss.channel_header('https://example.com/rss?a=1&b=2')
+
+    assert header.startswith(generate_rss.CHANNEL_HEAD)
+    assert header.endswith(generate_rss.CHANNEL_TAIL)
+    assert '<link>https://example.com/rss?a=1&amp;b=2</link>' in header
+    assert f'<title>{generate_rss.FEED_TITLE}</title>' in generate_rss.CHANNEL_HEAD
+
+
+def test_plain_item_flattens_attribute_types():
+    item = generate_rss.plain_item({
+        'id': {'S': 'tt1234567-1080p'},
+        'timestamp': {'N': '1700000000'},
+        'seeds': {'N': '10'},
+        'peers': {'N': '0'},
+        'rating': {'N': '7.1'},
+        'guid': {'NULL': True},
+    })
+
+    assert item == {
+        'id': 'tt1234567-1080p',
+        'timestamp': 1700000000,
+        'seeds': 10,
+        'peers': 0,
+        'rating': Decimal('7.1'),
+    }
+    assert type(item['timestamp']) is int
+
+
+def test_rebuild_follows_pages_with_shrinking_limit(monkeypatch, empty_cache):
+    def page(count, start, last_key=None):
+        items = [
+            {'id': {'S': f'tt{n:07d}-1080p'}, 'timestamp': {'N': str(1700000000 - n)}, 'title': {'S': f'Movie {n}'}}
+            for n in range(start, start + count)
+        ]
+        return {'Items': items, 'LastEvaluatedKey': last_key} if last_key else {'Items': items}
+
+    first_key = {'id': {'S': 'tt0000029-1080p'}}
+    second_key = {'id': {'S': 'tt0000044-1080p'}}
+    client, body = build_feed(
+        monkeypatch,
+        page(30, 0, first_key),
+        page(15, 30, second_key),
+        page(5, 45, {'id': {'S': 'tt0000049-1080p'}}),
+    )
+
+    assert [call['Limit'] for call in client.calls] == [50, 20, 5]
+    assert 'ExclusiveStartKey' not in client.calls[0]
+    assert client.calls[1]['ExclusiveStartKey'] == first_key
+    assert client.calls[2]['ExclusiveStartKey'] == second_key
+    assert body.count('<item>') == 50
+    assert client.pages == []
+
+
+def test_rebuild_stops_when_index_is_exhausted(monkeypatch, empty_cache):
+    client, body = build_feed(monkeypatch, {'Items': [
+        {'id': {'S': 'tt1234567-1080p'}, 'timestamp': {'N': '1700000000'}, 'title': {'S': 'Only'}},
+    ]})
+
+    assert len(client.calls) == 1
+    assert body.count('<item>') == 1
+
+
+@pytest.mark.parametrize("headers", [
+    {'If-None-Match': ETAG},
+    {'if-none-match': ETAG},
+    {'IF-NONE-MATCH': f'W/"other", {ETAG}'},
+    {'If-None-Match': '*'},
+    {'If-None-Match': f'W/{ETAG}'},
+    {'If-None-Match': f'"other" , W/{ETAG}'},
+])
+def test_etag_matches(headers):
+    assert generate_rss.etag_matches({'headers': headers}, ETAG)
+
+
+@pytest.mark.parametrize("event", [
+    {'headers': {'If-None-Match': '"other"'}},
+    {'headers': {'If-None-Match': ''}},
+    {'headers': {}},
+    {'headers': None},
+    {},
+])
+def test_etag_does_not_match(event):
+    assert not generate_rss.etag_matches(event, ETAG)
+
+
+def test_handler_returns_304_for_current_etag(cached_feed):
+    response = generate_rss.handler({'headers': {'if-none-match': ETAG}}, None)
+
+    assert response['statusCode'] == 304
+    assert response['headers']['ETag'] == ETAG
+    assert 'body' not in response
+
+
+def test_handler_returns_304_for_weak_gzip_etag(cached_feed):
+    response = generate_rss.handler({'headers': {**GZIP_REQUEST, 'If-None-Match': f'W/{GZIP_ETAG}'}}, None)
+
+    assert response['statusCode'] == 304
+    assert response['headers']['ETag'] == GZIP_ETAG
+
+
+def test_handler_returns_cached_feed_for_stale_etag(cached_feed):
+    response = generate_rss.handler({'headers': {'If-None-Match': '"stale"'}}, None)
+
+    assert response['statusCode'] == 200
+    assert response['headers']['ETag'] == ETAG
+    assert response['body'] == BODY
+
+
+@pytest.mark.parametrize("headers", [
+    GZIP_REQUEST,
+    {'accept': 'application/rss+xml;q=0.9', 'accept-encoding': 'br, GZIP;q=0.5'},
+    {'Accept': 'application/rss+xml', 'Accept-Encoding': 'deflate, *'},
+])
+def test_accepts_gzip(headers):
+    assert generate_rss.accepts_gzip({'headers': headers})
+
+
+@pytest.mark.parametrize("headers", [
+    # API Gateway only decodes the body when the first Accept type is binary
+    {'Accept': '*/*, application/rss+xml', 'Accept-Encoding': 'gzip'},
+    {'Accept-Encoding': 'gzip'},
+    {'Accept': 'application/rss+xml'},
+    {'Accept': 'application/rss+xml', 'Accept-Encoding': 'gzip;q=0'},
+    {'Accept': 'application/rss+xml', 'Accept-Encoding': 'gzip;q=0, *'},
+    {'Accept': 'application/rss+xml', 'Accept-Encoding': 'deflate, *;q=0'},
+    {'Accept': 'application/rss+xml', 'Accept-Encoding': 'gzip;q=oops'},
+])
+def test_does_not_accept_gzip(headers):
+    assert not generate_rss.accepts_gzip({'headers': headers})
+
+
+def test_feed_response_plain(cached_feed):
+    response = generate_rss.feed_response({'headers': {'Accept-Encoding': 'gzip'}})
+
+    assert response['statusCode'] == 200
+    assert response['body'] == BODY
+    assert response['headers']['ETag'] == ETAG
+    assert 'Content-Encoding' not in response['headers']
+    assert 'isBase64Encoded' not in response
+
+
+def test_feed_response_gzip(cached_feed):
+    response = generate_rss.feed_response({'headers': GZIP_REQUEST})
+
+    assert response['statusCode'] == 200
+    assert response['isBase64Encoded'] is True
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert response['headers']['ETag'] == GZIP_ETAG
+    assert gzip.decompress(base64.b64decode(response['body'])).decode('utf-8') == BODY
+
+
+def test_feed_response_304_only_for_matching_variant(cached_feed):
+    gzip_revalidation = generate_rss.feed_response({'headers': {**GZIP_REQUEST, 'If-None-Match': GZIP_ETAG}})
+    plain_with_gzip_etag = generate_rss.feed_response({'headers': {'If-None-Match': GZIP_ETAG}})
+    gzip_with_plain_etag = generate_rss.feed_response({'headers': {**GZIP_REQUEST, 'If-None-Match': ETAG}})
+
+    assert gzip_revalidation['statusCode'] == 304
+    assert gzip_revalidation['headers']['ETag'] == GZIP_ETAG
+    assert plain_with_gzip_etag['statusCode'] == 200
+    assert plain_with_gzip_etag['body'] == BODY
+    assert gzip_with_plain_etag['statusCode'] == 200
+    assert gzip_with_plain_etag['isBase64Encoded'] is True
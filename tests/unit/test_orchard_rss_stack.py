@@ -13,3 +13,51 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def test_rss_table_has_category_index():
+    app = core.App()
+    stack = OrchardRssStack(app, "orchard-rss")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": [{
+            "IndexName": "ByCategory",
+            "KeySchema": [
+                {"AttributeName": "category", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        }]
+    })
+
+
+def test_rss_table_keyed_by_id_only():
+    app = core.App()
+    stack = OrchardRssStack(app, "orchard-rss")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}]
+    })
+
+
+def test_api_returns_rss_as_binary():
+    app = core.App()
+    stack = OrchardRssStack(app, "orchard-rss")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::ApiGateway::RestApi", {
+        "BinaryMediaTypes": ["application/rss+xml"]
+    })
+
+
+def test_lambdas_use_full_vcpu_on_arm64():
+    app = core.App()
+    stack = OrchardRssStack(app, "orchard-rss")
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_properties_count_is("AWS::Lambda::Function", {
+        "MemorySize": 1769,
+        "Architectures": ["arm64"]
+    }, 2)
@@ -0,0 +1,238 @@
+import json
+import socket
+import threading
+
+import pytest
+import urllib3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+import process_data
+
+MOVIE = {
+    "id": 1,
+    "imdb_code": "tt1234567",
+    "title": "Movie",
+    "title_long": "Movie (2000)",
+    "year": 2000,
+    "rating": 7.1,
+    "torrents": [
+        {"quality": "720p", "seeds": 99, "url": "u720", "hash": "H720"},
+        {"quality": "1080p", "seeds": 5, "peers": 1, "size": "2 GB", "url": "u1", "hash": "H1"},
+        {"quality": "1080p", "seeds": 9, "peers": 2, "size": "2.1 GB", "url": "u2", "hash": "H2"},
+    ],
+}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.data = json.dumps(payload).encode("utf-8")
+
+
+class FakeHttp:
+    def __init__(self, movies):
+        self.movies = movies
+
+    def request(self, method, url):
+        imdb_id = url.split("query_term=")[1].split("&")[0]
+        movie = self.movies.get(imdb_id)
+        if movie is None:
+            return FakeResponse({"status": "ok", "data": {"movie_count": 0}})
+        return FakeResponse({"status": "ok", "data": {"movie_count": 1, "movies": [movie]}})
+
+
+class FakeBatchWriter:
+    """Buffers puts like boto3's BatchWriter, flushing every 25 items and on exit."""
+
+    def __init__(self, table):
+        self.table = table
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        self.table.batch_closed = True
+
+    def put_item(self, Item):
+        self.table.batch_put_calls += 1
+        self.buffer.append(Item)
+        if len(self.buffer) >= 25:
+            self.flush()
+
+    def flush(self):
+        self.table.batch_items.extend(self.buffer)
+        self.buffer = []
+
+
+class FakeTable:
+    def __init__(self):
+        self.put_item_calls = []
+        self.put_item_error = None
+        self.batch_kwargs = None
+        self.batch_put_calls = 0
+        self.batch_items = []  # items sent to DynamoDB by the batch writer
+        self.batch_closed = False
+
+    def put_item(self, **kwargs):
+        self.put_item_calls.append(kwargs)
+        if self.put_item_error:
+            raise ClientError({"Error": {"Code": self.put_item_error, "Message": "stub"}}, "PutItem")
+
+    def batch_writer(self, **kwargs):
+        self.batch_kwargs = kwargs
+        return FakeBatchWriter(self)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(process_data, "TABLE", table)
+    monkeypatch.setattr(process_data, "http", FakeHttp({"tt1234567": MOVIE}))
+    return table
+
+
+class FakeContext:
+    def __init__(self, *remaining_ms):
+        self.remaining_ms = list(remaining_ms)
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms.pop(0)
+
+
+def invoke(body, context=None):
+    response = process_data.handler({"body": json.dumps(body)}, context)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_put_is_conditional_on_a_newer_timestamp(table):
+    status, body = invoke({"imdb": "tt1234567"})
+
+    assert status == 200
+    assert body["item_id"] == "tt1234567-1080p"
+    (call,) = table.put_item_calls
+    item = call["Item"]
+    assert item["id"] == "tt1234567-1080p"
+    assert call["ConditionExpression"] == (
+        Attr("timestamp").not_exists() | Attr("timestamp").lt(item["timestamp"])
+    )
+
+
+def test_put_with_newer_existing_item_still_succeeds(table):
+    table.put_item_error = "ConditionalCheckFailedException"
+
+    status, body = invoke({"imdb": "tt1234567"})
+
+    assert status == 200
+    assert body["item_id"] == "tt1234567-1080p"
+    assert len(table.put_item_calls) == 1
+
+
+def test_put_with_other_client_error_fails(table):
+    table.put_item_error = "ProvisionedThroughputExceededException"
+
+    status, body = invoke({"imdb": "tt1234567"})
+
+    assert status == 500
+    assert body["error"] == "Failed to process request"
+
+
+def test_batch_writes_built_items_and_reports_failures(table):
+    status, body = invoke({"items": [
+        "tt1234567",
+        {"imdb": "not-an-id"},
+        {"url": "https://www.imdb.com/title/tt7654321/"},
+        {},
+    ]})
+
+    assert status == 200
+    assert body["item_ids"] == ["tt1234567-1080p"]
+    assert [(f["input"], f["statusCode"]) for f in body["failed"]] == [
+        ("not-an-id", 400),
+        ("https://www.imdb.com/title/tt7654321/", 404),
+        ("", 400),
+    ]
+    assert table.batch_kwargs == {"overwrite_by_pkeys": ["id"]}
+    assert table.batch_closed
+    assert len(table.batch_items) == 1
+    item = table.batch_items[0]
+    assert item["id"] == "tt1234567-1080p"
+    assert item["guid"] == "H2"  # 1080p torrent with the most seeds
+
+
+def test_batch_reports_non_string_entries(table):
+    status, body = invoke({"items": ["tt1234567", 5, ["tt1"]]})
+
+    assert status == 200
+    assert body["item_ids"] == ["tt1234567-1080p"]
+    assert body["failed"] == [
+        {"input": 5, "statusCode": 400, "error": "Invalid IMDB format", "provided": 5},
+        {"input": ["tt1"], "statusCode": 400, "error": "Invalid IMDB format", "provided": ["tt1"]},
+    ]
+    assert [item["id"] for item in table.batch_items] == ["tt1234567-1080p"]
+
+
+@pytest.mark.parametrize("items", [[], {"imdb": "tt1234567"}, "tt1234567"])
+def test_batch_rejects_empty_or_non_list_items(table, items):
+    status, body = invoke({"items": items})
+
+    assert status == 400
+    assert body == {"error": "'items' must be a non-empty list."}
+    assert table.batch_kwargs is None
+
+
+def test_batch_rejects_too_many_entries(table):
+    status, body = invoke({"items": ["tt1234567"] * (process_data.MAX_BATCH_SIZE + 1)})
+
+    assert status == 400
+    assert body == {"error": f"'items' may contain at most {process_data.MAX_BATCH_SIZE} entries."}
+    assert table.batch_kwargs is None
+
+
+def test_batch_stops_lookups_when_out_of_time(table):
+    context = FakeContext(30000, process_data.LOOKUP_RESERVE_MS - 1)
+    status, body = invoke({"items": ["tt1234567", "tt7654321", {"imdb": "tt1111111"}]}, context)
+
+    assert status == 200
+    assert body["item_ids"] == ["tt1234567-1080p"]
+    assert body["failed"] == [
+        {"input": "tt7654321", "statusCode": 503, "error": "Not processed before the Lambda timeout"},
+        {"input": "tt1111111", "statusCode": 503, "error": "Not processed before the Lambda timeout"},
+    ]
+    assert context.remaining_ms == []
+    assert [item["id"] for item in table.batch_items] == ["tt1234567-1080p"]
+    assert table.batch_closed
+
+
+def test_batch_puts_each_item_before_the_next_lookup(table, monkeypatch):
+    puts_before_lookup = []
+    lookup = process_data.search_yts_by_imdb
+
+    def recording_lookup(imdb_id):
+        puts_before_lookup.append(table.batch_put_calls)
+        return lookup(imdb_id)
+
+    monkeypatch.setattr(process_data, "search_yts_by_imdb", recording_lookup)
+    invoke({"items": ["tt1234567", "tt1234567"]})
+
+    # put_item only hands items to the buffered writer; both are sent on exit
+    assert puts_before_lookup == [0, 1]
+    assert len(table.batch_items) == 2
+
+
+def test_yts_timeouts_are_not_retried():
+    # A server that accepts connections but never replies
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    accepted = []
+    threading.Thread(target=lambda: [accepted.append(server.accept()) for _ in range(8)], daemon=True).start()
+
+    try:
+        with pytest.raises(urllib3.exceptions.MaxRetryError):
+            process_data.http.request("GET", f"http://127.0.0.1:{server.getsockname()[1]}/", timeout=0.2)
+    finally:
+        server.close()
+
+    assert len(accepted) == 1